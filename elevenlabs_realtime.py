@@ -5,15 +5,18 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-import base64
+import binascii
+import collections
+import concurrent.futures
 import contextlib
 import datetime as dt
+import mmap
 import os
-import queue
 import shutil
+import signal
+import struct
 import threading
 import time
-import wave
 from pathlib import Path
 
 import numpy as np
@@ -29,6 +32,9 @@ from elevenlabs import (
 
 
 CHANNELS = 1
+WAV_FLUSH_SECS = 1.0
+PARTIAL_RENDER_INTERVAL_SECS = 0.05
+TERM_WIDTH_REFRESH_SECS = 1.0
 
 SAMPLE_RATE_TO_FORMAT = {
     8000: AudioFormat.PCM_8000,
@@ -44,14 +50,96 @@ def now_stamp() -> str:
     return dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
+class MmapWavWriter:
+    """PCM WAV writer that appends into a growing mmap.
+
+    Unlike ``wave.Wave_write`` the RIFF header is not patched on every write;
+    callers refresh it with ``patch_header`` at their own cadence, and
+    ``close`` trims the preallocated padding.
+    """
+
+    HEADER_SIZE = 44
+    GROW_SECS = 60
+
+    def __init__(self, path: Path, sample_rate: int, channels: int, sampwidth: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sampwidth = sampwidth
+        self._grow_bytes = sample_rate * channels * sampwidth * self.GROW_SECS
+        self._file = path.open("w+b")
+        self._mmap: mmap.mmap | None = None
+        self._capacity = 0
+        self._data_len = 0
+        self._grow(self._grow_bytes)
+        self._mmap[: self.HEADER_SIZE] = self._header(0)
+
+    def _header(self, data_len: int) -> bytes:
+        block_align = self.channels * self.sampwidth
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF",
+            36 + data_len,
+            b"WAVE",
+            b"fmt ",
+            16,
+            1,
+            self.channels,
+            self.sample_rate,
+            self.sample_rate * block_align,
+            block_align,
+            self.sampwidth * 8,
+            b"data",
+            data_len,
+        )
+
+    def _grow(self, min_capacity: int) -> None:
+        capacity = self._capacity
+        while capacity < min_capacity:
+            capacity += self._grow_bytes
+        if self._mmap is not None:
+            self._mmap.close()
+        size = self.HEADER_SIZE + capacity
+        os.ftruncate(self._file.fileno(), size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._capacity = capacity
+
+    def writeframes(self, data: bytes | bytearray) -> None:
+        end = self._data_len + len(data)
+        if end > self._capacity:
+            self._grow(end)
+        start = self.HEADER_SIZE + self._data_len
+        self._mmap[start : self.HEADER_SIZE + end] = data
+        self._data_len = end
+
+    def patch_header(self) -> None:
+        # Keeps the file readable (padding aside) if close() is never reached.
+        if self._mmap is not None:
+            self._mmap[: self.HEADER_SIZE] = self._header(self._data_len)
+
+    def close(self) -> None:
+        if self._mmap is None:
+            return
+        self.patch_header()
+        self._mmap.flush()
+        self._mmap.close()
+        self._mmap = None
+        os.ftruncate(self._file.fileno(), self.HEADER_SIZE + self._data_len)
+        self._file.close()
+
+
 class ElevenLabsRealtimeTranscriber:
     def __init__(self, args: argparse.Namespace):
         self.args = args
         self.chunk_samples = int(args.sample_rate * args.chunk_ms / 1000)
+        self._pad = np.zeros((self.chunk_samples,), dtype=np.int16)
         self.stop_event = threading.Event()
-        self.audio_queue: queue.Queue[bytes] = queue.Queue(
-            maxsize=args.max_audio_queue_chunks
+        self.loop: asyncio.AbstractEventLoop | None = None
+        # Drop-oldest ring filled from the PortAudio thread; deque.append is
+        # atomic, and audio_ready wakes the sender on the event loop.
+        self.audio_ring: collections.deque[bytes] = collections.deque(
+            maxlen=args.max_audio_queue_chunks
         )
+        self.audio_ready = asyncio.Event()
 
         load_dotenv()
         api_key = args.api_key or os.getenv("ELEVENLABS_API_KEY")
@@ -81,32 +169,51 @@ class ElevenLabsRealtimeTranscriber:
         self.transcript_plain_path = self.session_dir / "transcript_plain.txt"
 
         self.write_lock = threading.Lock()
+        self._wav_buf = bytearray()
+        self._wav_buf_lock = threading.Lock()
+        # One worker keeps transcript/segment writes in commit order.
+        self._io_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._io_closed = False
+        self._send_template = {"audio_base_64": "", "sample_rate": args.sample_rate}
         self.segment_index = 0
         self.last_partial_text = ""
         self.partial_line_active = False
         self.partial_render_len = 0
+        self._pending_partial: str | None = None
+        self._partial_flush_handle: asyncio.TimerHandle | None = None
+        self._last_partial_render = 0.0
+        self._term_width = shutil.get_terminal_size(fallback=(120, 20)).columns
+        self._term_width_ts = time.monotonic()
         self.last_committed_text = ""
         self.last_committed_time = 0.0
 
-        self.stream_wav = wave.open(str(self.stream_wav_path), "wb")
-        self.stream_wav.setnchannels(CHANNELS)
-        self.stream_wav.setsampwidth(2)
-        self.stream_wav.setframerate(args.sample_rate)
-
-        with self.transcript_path.open("w", encoding="utf-8") as f:
-            f.write("ElevenLabs Realtime Transcript\n")
-            f.write(f"Started: {now_stamp()}\n")
-            f.write(f"Model: {args.model}\n")
-            f.write(f"Commit strategy: {args.commit_strategy}\n")
-            f.write(f"Sample rate: {args.sample_rate}\n")
-            f.write("\n")
+        self.stream_wav = MmapWavWriter(
+            self.stream_wav_path, args.sample_rate, CHANNELS, sampwidth=2
+        )
 
-        with self.transcript_plain_path.open("w", encoding="utf-8") as f:
-            f.write("")
+        # Transcript files stay open for the whole session and are flushed
+        # once per committed segment; see _flush_transcripts.
+        self._transcript_fh = self.transcript_path.open(
+            "w", encoding="utf-8", buffering=8192
+        )
+        self._transcript_fh.write("ElevenLabs Realtime Transcript\n")
+        self._transcript_fh.write(f"Started: {now_stamp()}\n")
+        self._transcript_fh.write(f"Model: {args.model}\n")
+        self._transcript_fh.write(f"Commit strategy: {args.commit_strategy}\n")
+        self._transcript_fh.write(f"Sample rate: {args.sample_rate}\n")
+        self._transcript_fh.write("\n")
+        self._transcript_fh.flush()
+
+        self._plain_fh = self.transcript_plain_path.open(
+            "w", encoding="utf-8", buffering=8192
+        )
 
     def _fit_partial_for_terminal(self, text: str) -> str:
-        width = shutil.get_terminal_size(fallback=(120, 20)).columns
-        max_len = max(20, width - 1)
+        now = time.monotonic()
+        if now - self._term_width_ts > TERM_WIDTH_REFRESH_SECS:
+            self._term_width = shutil.get_terminal_size(fallback=(120, 20)).columns
+            self._term_width_ts = now
+        max_len = max(20, self._term_width - 1)
         if len(text) <= max_len:
             return text
         return "..." + text[-(max_len - 3) :]
@@ -118,6 +225,21 @@ class ElevenLabsRealtimeTranscriber:
         self.partial_line_active = True
         self.partial_render_len = len(rendered)
 
+    def _flush_partial(self) -> None:
+        self._partial_flush_handle = None
+        text, self._pending_partial = self._pending_partial, None
+        if text:
+            self._render_partial_line(text)
+            self._last_partial_render = time.monotonic()
+
+    def _cancel_pending_partial(self) -> None:
+        if self._partial_flush_handle is not None:
+            self._partial_flush_handle.cancel()
+            self._partial_flush_handle = None
+        if self._pending_partial is not None:
+            self._pending_partial = None
+            self.last_partial_text = ""
+
     def _dedupe_committed_text(self, text: str) -> str:
         current = (text or "").strip()
         if not current:
@@ -150,11 +272,15 @@ class ElevenLabsRealtimeTranscriber:
             return ""
 
         max_overlap = min(len(previous), len(current), 220)
-        overlap = 0
-        for size in range(max_overlap, 19, -1):
-            if previous[-size:] == current[:size]:
-                overlap = size
-                break
+        # Longest suffix of previous that is also a prefix of current (>= 20).
+        overlap = next(
+            (
+                size
+                for size in range(max_overlap, 19, -1)
+                if previous.endswith(current[:size])
+            ),
+            0,
+        )
 
         self.last_committed_text = current
         self.last_committed_time = now
@@ -163,6 +289,7 @@ class ElevenLabsRealtimeTranscriber:
         return current
 
     def _print_committed_line(self, line: str) -> None:
+        self._cancel_pending_partial()
         if self.args.show_partial and self.partial_line_active:
             clear = " " * self.partial_render_len
             # Overwrite the current rolling partial line with final text.
@@ -173,15 +300,34 @@ class ElevenLabsRealtimeTranscriber:
         else:
             print(line)
 
-    def _append_transcript(self, text: str) -> None:
+    def _write_line(self, fh, text: str) -> None:
         with self.write_lock:
-            with self.transcript_path.open("a", encoding="utf-8") as f:
-                f.write(text + "\n")
+            fh.write(text)
 
-    def _append_plain(self, text: str) -> None:
+    def _flush_transcripts(self) -> None:
         with self.write_lock:
-            with self.transcript_plain_path.open("a", encoding="utf-8") as f:
-                f.write(text + "\n\n")
+            self._transcript_fh.flush()
+            self._plain_fh.flush()
+
+    def _submit_io(self, fn, *args, **kwargs) -> None:
+        # Late SDK events after teardown are dropped rather than hitting a
+        # shut-down executor.
+        if self._io_closed:
+            return
+        future = self._io_executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._report_io_error)
+
+    def _report_io_error(self, future: concurrent.futures.Future) -> None:
+        # Runs on the IO worker; hand off so the partial line is cleared first.
+        exc = future.exception()
+        if exc is not None:
+            self.loop.call_soon_threadsafe(self._on_io_error, exc)
+
+    def _append_transcript(self, text: str) -> None:
+        self._submit_io(self._write_line, self._transcript_fh, text + "\n")
+
+    def _append_plain(self, text: str) -> None:
+        self._submit_io(self._write_line, self._plain_fh, text + "\n\n")
 
     def _audio_callback(self, indata, frames, time_info, status):
         del time_info
@@ -189,30 +335,20 @@ class ElevenLabsRealtimeTranscriber:
         if status and self.args.display == "full":
             print(f"[audio] {status}")
 
-        frame = indata[:, 0].copy().reshape(-1)
-        if frames != self.chunk_samples:
-            padded = np.zeros((self.chunk_samples,), dtype=np.int16)
-            keep = min(len(frame), self.chunk_samples)
-            padded[:keep] = frame[:keep]
-            frame = padded
+        # InputStream is opened with dtype=int16, so no conversion is needed.
+        if frames == self.chunk_samples:
+            audio_bytes = indata[:, 0].tobytes()
         else:
-            frame = frame.astype(np.int16)
+            keep = min(frames, self.chunk_samples)
+            np.copyto(self._pad[:keep], indata[:keep, 0])
+            self._pad[keep:] = 0
+            audio_bytes = self._pad.tobytes()
+        # Only buffer here; _wav_flush_loop writes to disk off this thread.
+        with self._wav_buf_lock:
+            self._wav_buf.extend(audio_bytes)
 
-        audio_bytes = frame.tobytes()
-        with self.write_lock:
-            self.stream_wav.writeframes(audio_bytes)
-
-        try:
-            self.audio_queue.put_nowait(audio_bytes)
-        except queue.Full:
-            try:
-                self.audio_queue.get_nowait()
-            except queue.Empty:
-                pass
-            try:
-                self.audio_queue.put_nowait(audio_bytes)
-            except queue.Full:
-                pass
+        self.audio_ring.append(audio_bytes)
+        self.loop.call_soon_threadsafe(self.audio_ready.set)
 
     def _handle_committed_text(self, text: str) -> None:
         text = self._dedupe_committed_text(text)
@@ -222,7 +358,7 @@ class ElevenLabsRealtimeTranscriber:
         self.segment_index += 1
         stamp = now_stamp()
         seg_txt = self.segments_dir / f"seg_{self.segment_index:05d}.txt"
-        seg_txt.write_text(text + "\n", encoding="utf-8")
+        self._submit_io(seg_txt.write_text, text + "\n", encoding="utf-8")
 
         terminal_line = text if self.args.display == "text" else f"[{stamp}] {text}"
 
@@ -235,6 +371,7 @@ class ElevenLabsRealtimeTranscriber:
         self._append_transcript(f"segment_text: {seg_txt}")
         self._append_transcript("")
         self._append_plain(text)
+        self._submit_io(self._flush_transcripts)
 
     def _on_session_started(self, data):
         if self.args.display == "full":
@@ -249,9 +386,20 @@ class ElevenLabsRealtimeTranscriber:
             if text == self.last_partial_text:
                 return
 
-            # Render partial on one rolling terminal line (no repeated spam lines).
-            self._render_partial_line(text)
+            # Render partial on one rolling terminal line (no repeated spam lines),
+            # coalescing bursts so at most one redraw happens per interval.
             self.last_partial_text = text
+            self._pending_partial = text
+            if self._partial_flush_handle is not None:
+                return
+            elapsed = time.monotonic() - self._last_partial_render
+            delay = PARTIAL_RENDER_INTERVAL_SECS - elapsed
+            if delay <= 0:
+                self._flush_partial()
+            else:
+                self._partial_flush_handle = self.loop.call_later(
+                    delay, self._flush_partial
+                )
 
     def _on_committed_transcript(self, data):
         if self.args.include_timestamps:
@@ -264,39 +412,71 @@ class ElevenLabsRealtimeTranscriber:
         if self.args.include_timestamps:
             self._handle_committed_text(data.get("text", ""))
 
-    def _on_error(self, data):
+    def _clear_partial_line(self) -> None:
+        self._cancel_pending_partial()
         if self.args.show_partial and self.partial_line_active:
             clear = " " * self.partial_render_len
             print(f"\r{clear}\r")
             self.partial_line_active = False
             self.partial_render_len = 0
             self.last_partial_text = ""
+
+    def _on_error(self, data):
+        self._clear_partial_line()
         if self.args.display == "full":
             print(f"error: {data}")
 
     def _on_close(self, *_):
-        if self.args.show_partial and self.partial_line_active:
-            clear = " " * self.partial_render_len
-            print(f"\r{clear}\r")
-            self.partial_line_active = False
-            self.partial_render_len = 0
-            self.last_partial_text = ""
+        self._clear_partial_line()
         if self.args.display == "full":
             print("Connection closed")
 
+    def _on_io_error(self, exc: BaseException) -> None:
+        self._clear_partial_line()
+        print(f"ERROR: transcript write failed: {exc!r}")
+
     async def _sender_loop(self, connection) -> None:
-        while not self.stop_event.is_set() or not self.audio_queue.empty():
-            try:
-                audio_bytes = self.audio_queue.get_nowait()
-            except queue.Empty:
-                await asyncio.sleep(0.002)
-                continue
+        while True:
+            await self.audio_ready.wait()
+            self.audio_ready.clear()
+            while self.audio_ring:
+                audio_bytes = self.audio_ring.popleft()
+                # The SDK only accepts base64 text, so encode raw PCM exactly
+                # once. send() copies fields into its own message, so the
+                # template is safe to reuse across chunks.
+                audio_b64 = binascii.b2a_base64(audio_bytes, newline=False)
+                self._send_template["audio_base_64"] = audio_b64.decode("ascii")
+                await connection.send(self._send_template)
+            if self.stop_event.is_set() and not self.audio_ring:
+                break
 
-            payload = {
-                "audio_base_64": base64.b64encode(audio_bytes).decode("utf-8"),
-                "sample_rate": self.args.sample_rate,
-            }
-            await connection.send(payload)
+    def _flush_wav(self) -> None:
+        # Hold write_lock across swap and write so flushes land in order.
+        with self.write_lock:
+            with self._wav_buf_lock:
+                buf, self._wav_buf = self._wav_buf, bytearray()
+            if buf:
+                self.stream_wav.writeframes(buf)
+                self.stream_wav.patch_header()
+
+    async def _finalize_outputs(self) -> None:
+        # Flip the flag on the loop thread, so no submit can race the shutdown.
+        self._io_closed = True
+        await asyncio.to_thread(self._close_outputs)
+
+    def _close_outputs(self) -> None:
+        # Final flush + close; run via asyncio.to_thread to keep the loop free.
+        self._io_executor.shutdown(wait=True)
+        self._flush_wav()
+        with self.write_lock:
+            self.stream_wav.close()
+            self._transcript_fh.close()
+            self._plain_fh.close()
+
+    async def _wav_flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(WAV_FLUSH_SECS)
+            await self.loop.run_in_executor(None, self._flush_wav)
 
     async def _periodic_commit_loop(self, connection) -> None:
         # Streaming mode: commit on a timer so transcript segments keep flowing
@@ -336,11 +516,30 @@ class ElevenLabsRealtimeTranscriber:
         return RealtimeAudioOptions(**kwargs)
 
     async def run(self) -> None:
+        self.loop = asyncio.get_running_loop()
         options = self._build_options()
         realtime_client = getattr(self.client.speech_to_text, "realtime", None)
         if realtime_client is None:
             raise RuntimeError("Realtime client unavailable in current ElevenLabs SDK")
-        connection = await realtime_client.connect(options)
+
+        stream = sd.InputStream(
+            samplerate=self.args.sample_rate,
+            channels=CHANNELS,
+            dtype=np.int16,
+            blocksize=self.chunk_samples,
+            latency="low",
+            callback=self._audio_callback,
+        )
+        # Capture while the handshake is in flight; chunks wait in audio_ring
+        # until the sender starts, so the connect round trip loses no audio.
+        stream.start()
+        try:
+            connection = await realtime_client.connect(options)
+        except BaseException:
+            stream.stop()
+            stream.close()
+            await self._finalize_outputs()
+            raise
 
         connection.on(RealtimeEvents.SESSION_STARTED, self._on_session_started)
         connection.on(RealtimeEvents.PARTIAL_TRANSCRIPT, self._on_partial_transcript)
@@ -366,35 +565,47 @@ class ElevenLabsRealtimeTranscriber:
             print("")
 
         sender_task = asyncio.create_task(self._sender_loop(connection))
+        wav_task = asyncio.create_task(self._wav_flush_loop())
         commit_task = None
         if self.args.commit_strategy == "streaming":
             commit_task = asyncio.create_task(self._periodic_commit_loop(connection))
 
+        watch_resize = hasattr(signal, "SIGWINCH")
+        if watch_resize:
+            # Force a width refresh on the next partial after a resize.
+            self.loop.add_signal_handler(
+                signal.SIGWINCH, setattr, self, "_term_width_ts", 0.0
+            )
+
         try:
-            with sd.InputStream(
-                samplerate=self.args.sample_rate,
-                channels=CHANNELS,
-                dtype=np.int16,
-                blocksize=self.chunk_samples,
-                latency="low",
-                callback=self._audio_callback,
-            ):
-                while not self.stop_event.is_set():
-                    await asyncio.sleep(0.2)
+            # Park until Ctrl+C cancels the task; no idle polling ticks.
+            await self.loop.create_future()
         except KeyboardInterrupt:
             pass
         finally:
+            if watch_resize:
+                self.loop.remove_signal_handler(signal.SIGWINCH)
+            # stop() drains pending buffers; close() alone would abort them.
+            stream.stop()
+            stream.close()
             self.stop_event.set()
-            if commit_task:
-                commit_task.cancel()
+            # Runs after any pending callback wakeups, so the ring is drained.
+            self.loop.call_soon(self.audio_ready.set)
+            try:
+                if commit_task:
+                    commit_task.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await commit_task
+                await sender_task
+                await connection.commit()
+                await asyncio.sleep(self.args.final_commit_wait_secs)
+                await connection.close()
+            finally:
+                # Always finalize local outputs, even if connection teardown fails.
+                wav_task.cancel()
                 with contextlib.suppress(asyncio.CancelledError):
-                    await commit_task
-            await sender_task
-            await connection.commit()
-            await asyncio.sleep(self.args.final_commit_wait_secs)
-            await connection.close()
-            with self.write_lock:
-                self.stream_wav.close()
+                    await wav_task
+                await self._finalize_outputs()
 
             if self.args.display == "full":
                 print("Done.")
@@ -70,8 +70,14 @@ def main() -> None:
 
     env = dict(os.environ)
     env.pop("VIRTUAL_ENV", None)
-    result = subprocess.run(cmd, env=env)
-    raise SystemExit(result.returncode)
+    if os.name == "nt":
+        # Windows exec spawns the child and exits the parent immediately, so
+        # wait for it here to keep the console and exit status intact.
+        result = subprocess.run(cmd, env=env)
+        raise SystemExit(result.returncode)
+
+    # Replace this process so the child owns the terminal and exit status.
+    os.execvpe(cmd[0], cmd, env)
 
 
 if __name__ == "__main__":